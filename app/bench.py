@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import random
+import tempfile
+import time
+from typing import Callable
+
+from . import tools as tool_mod
+from .db import ShardSet, connect_shards, init_shards, shard_paths
+
+
+def _per_shard(shards: ShardSet, client_ids: dict[int, list[int]], fn: Callable[[int, list[int]], None]) -> float:
+    # One worker per shard, each touching only its own shard's clients: this is
+    # the concurrency sharding buys (one writer per file instead of one overall).
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        futures = [pool.submit(fn, index, client_ids[index]) for index in range(len(shards))]
+        for future in futures:
+            future.result()
+    return time.perf_counter() - start
+
+
+def run(shard_count: int, workdir: Path, clients: int, orders_per_client: int, searches: int) -> dict[str, float]:
+    shards = connect_shards(shard_paths(str(workdir / f"bench{shard_count}.db"), shard_count))
+    try:
+        init_shards(shards)
+        by_shard: dict[int, list[int]] = defaultdict(list)
+        for i in range(clients):
+            client_id = shards.insert_client(f"Client {i:05d}", f"client{i}@bench.example", "2025-01-01T00:00:00Z")
+            by_shard[shards.index_for(client_id)].append(client_id)
+
+        def ingest(index: int, client_ids: list[int]) -> None:
+            # One generator per worker: a shared one would be drawn from in
+            # thread-scheduling order and runs would not be reproducible.
+            rng = random.Random(f"{shard_count}-{index}")
+            for client_id in client_ids:
+                for _ in range(orders_per_client):
+                    year = rng.choice((2023, 2024, 2025))
+                    shards.insert_order(
+                        client_id,
+                        rng.choice(("new", "paid", "shipped", "cancelled")),
+                        round(rng.uniform(50, 1200), 2),
+                        "PLN",
+                        f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00Z",
+                    )
+
+        def read(index: int, client_ids: list[int]) -> None:
+            for client_id in client_ids:
+                tool_mod.count_orders_for_client(shards, client_id, from_date="2024", to_date="2024")
+                tool_mod.sum_orders_for_client(shards, client_id, status="paid")
+                tool_mod.get_orders_for_client(shards, client_id, limit=10)
+
+        ingest_s = _per_shard(shards, by_shard, ingest)
+        read_s = _per_shard(shards, by_shard, read)
+
+        start = time.perf_counter()
+        for i in range(searches):
+            tool_mod.search_clients(shards, f"Client {i % 100:02d}", limit=20)
+        search_s = time.perf_counter() - start
+    finally:
+        shards.close()
+
+    return {
+        "shards": shard_count,
+        "ingest_orders_per_s": clients * orders_per_client / ingest_s,
+        "reads_per_s": clients * 3 / read_s,
+        "searches_per_s": searches / search_s,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.bench",
+        description="Measure ingest/read throughput of the sharded store for several shard counts.",
+    )
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=10, help="Orders per client")
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--dir", help="Where to create benchmark databases (default: temporary directory)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(args.dir or tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        print(f"{'shards':>6} {'ingest orders/s':>16} {'reads/s':>10} {'searches/s':>11}")
+        for n in args.shards:
+            r = run(n, workdir, args.clients, args.orders, args.searches)
+            print(
+                f"{r['shards']:>6} {r['ingest_orders_per_s']:>16.0f} "
+                f"{r['reads_per_s']:>10.0f} {r['searches_per_s']:>11.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
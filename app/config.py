@@ -17,6 +17,9 @@ class Settings:
     gemini_api_key: str
     gemini_model: str
     sqlite_path: str
+    sqlite_shards: int
+    archive_dir: str
+    auto_archive_orders: bool
     debug_tool_trace: bool
 
 
@@ -27,6 +30,13 @@ def _get_bool(name: str, default: bool = False) -> bool:
     return raw.strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
+def _get_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return int(raw.strip())
+
+
 def _get_str(name: str, default: str = "") -> str:
     raw = os.getenv(name)
     if raw is None:
@@ -43,5 +53,8 @@ def get_settings() -> Settings:
         gemini_api_key=_get_str("GEMINI_API_KEY", ""),
         gemini_model=_get_str("GEMINI_MODEL", "gemini-2.5-flash"),
         sqlite_path=_get_str("SQLITE_PATH", "./app.db"),
+        sqlite_shards=max(1, _get_int("SQLITE_SHARDS", 1)),
+        archive_dir=_get_str("ARCHIVE_DIR", "./archive"),
+        auto_archive_orders=_get_bool("AUTO_ARCHIVE_ORDERS", False),
         debug_tool_trace=_get_bool("DEBUG_TOOL_TRACE", False),
     )
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import os
 import sqlite3
+import stat
+import tempfile
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, TypeVar
+import zlib
+
+
+T = TypeVar("T")
 
 
 SCHEMA_SQL = """
@@ -15,24 +24,67 @@ CREATE TABLE IF NOT EXISTS clients (
   created_at TEXT NOT NULL
 );
 
-CREATE TABLE IF NOT EXISTS orders (
-  order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+-- With sharding, client ids are allocated from shard 0 so they are unique
+-- across shards (the id then decides which shard owns the client).
+CREATE TABLE IF NOT EXISTS client_ids (
+  client_id INTEGER PRIMARY KEY AUTOINCREMENT
+);
+
+-- Shard layout, kept on shard 0: lets startup refuse a SQLITE_SHARDS value
+-- that was changed without running `python -m app.rebalance`.
+CREATE TABLE IF NOT EXISTS shard_meta (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+
+-- Orders are partitioned by year (orders_<YYYY>); order_id comes from one
+-- shared sequence so ids stay unique across partitions.
+CREATE TABLE IF NOT EXISTS order_ids (
+  order_id INTEGER PRIMARY KEY AUTOINCREMENT
+);
+
+-- Partition catalog. archive_path IS NULL -> hot table in this database,
+-- otherwise a read-only archive file holding an `orders` table.
+CREATE TABLE IF NOT EXISTS order_partitions (
+  year INTEGER PRIMARY KEY,
+  archive_path TEXT
+);
+"""
+
+PARTITION_SQL = """
+CREATE TABLE IF NOT EXISTS {table} (
+  order_id INTEGER PRIMARY KEY,
   client_id INTEGER NOT NULL,
   status TEXT NOT NULL,
   total_amount REAL NOT NULL,
   currency TEXT NOT NULL,
-  created_at TEXT NOT NULL,
-  FOREIGN KEY (client_id) REFERENCES clients(client_id)
+  created_at TEXT NOT NULL{fk}
 );
 
-CREATE INDEX IF NOT EXISTS idx_orders_client_id ON orders(client_id);
-CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
+CREATE INDEX IF NOT EXISTS idx_{table}_client_created ON {table}(client_id, created_at);
 """
 
+ORDER_COLUMNS = "order_id, client_id, status, total_amount, currency, created_at"
 
-def connect(db_path: str) -> sqlite3.Connection:
-    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+
+@dataclass(frozen=True)
+class OrderPartition:
+    year: int
+    archive_path: str | None = None
+
+    @property
+    def is_archived(self) -> bool:
+        return self.archive_path is not None
+
+
+def connect(db_path: str, check_same_thread: bool = True, read_only: bool = False) -> sqlite3.Connection:
+    if read_only:
+        target = Path(db_path).resolve().as_uri() + "?mode=ro"
+    else:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        target = db_path
+    # uri=True lets archive partitions be attached with ?mode=ro.
+    conn = sqlite3.connect(target, uri=True, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
     return conn
@@ -41,6 +93,7 @@ def connect(db_path: str) -> sqlite3.Connection:
 def init_db(conn: sqlite3.Connection) -> None:
     conn.executescript(SCHEMA_SQL)
     conn.commit()
+    _migrate_legacy_orders(conn)
 
 
 def query_all(conn: sqlite3.Connection, sql: str, params: Iterable[Any] = ()) -> list[sqlite3.Row]:
@@ -63,3 +116,376 @@ def execute(conn: sqlite3.Connection, sql: str, params: Iterable[Any] = ()) -> i
     rowid = cur.lastrowid
     cur.close()
     return int(rowid)
+
+
+# --- Order partitions -------------------------------------------------------
+
+
+def partition_table(year: int) -> str:
+    return f"orders_{int(year):04d}"
+
+
+def _create_partition(conn: sqlite3.Connection, table: str, with_fk: bool = True) -> None:
+    fk = ",\n  FOREIGN KEY (client_id) REFERENCES clients(client_id)" if with_fk else ""
+    conn.executescript(PARTITION_SQL.format(table=table, fk=fk))
+
+
+def ensure_order_partition(conn: sqlite3.Connection, year: int) -> OrderPartition:
+    year = int(year)
+    row = query_one(conn, "SELECT year, archive_path FROM order_partitions WHERE year = ?", (year,))
+    if row is not None:
+        return OrderPartition(year=year, archive_path=row["archive_path"])
+    _create_partition(conn, partition_table(year))
+    execute(conn, "INSERT INTO order_partitions(year, archive_path) VALUES (?, NULL)", (year,))
+    return OrderPartition(year=year)
+
+
+def order_partitions(
+    conn: sqlite3.Connection,
+    from_year: int | None = None,
+    to_year: int | None = None,
+) -> list[OrderPartition]:
+    """Partitions overlapping [from_year, to_year] (open ends allowed), newest first."""
+    where: list[str] = []
+    params: list[Any] = []
+    if from_year is not None:
+        where.append("year >= ?")
+        params.append(int(from_year))
+    if to_year is not None:
+        where.append("year <= ?")
+        params.append(int(to_year))
+    sql = "SELECT year, archive_path FROM order_partitions"
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    sql += " ORDER BY year DESC"
+    return [OrderPartition(year=int(r["year"]), archive_path=r["archive_path"]) for r in query_all(conn, sql, params)]
+
+
+def query_partition(
+    conn: sqlite3.Connection,
+    partition: OrderPartition,
+    sql: str,
+    params: Iterable[Any] = (),
+) -> list[sqlite3.Row]:
+    """Run `sql` against one partition; `{orders}` in the SQL names its table.
+
+    Archives are attached read-only only for the duration of the query, so an
+    open date range never runs into SQLite's limit on attached databases.
+    """
+    if not partition.is_archived:
+        return query_all(conn, sql.format(orders=f"main.{partition_table(partition.year)}"), params)
+
+    schema = f"archive_{partition.year:04d}"
+    uri = Path(partition.archive_path).resolve().as_uri() + "?mode=ro"
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (uri,))
+    try:
+        return query_all(conn, sql.format(orders=f"{schema}.orders"), params)
+    finally:
+        conn.execute(f"DETACH DATABASE {schema}")
+
+
+def insert_order(
+    conn: sqlite3.Connection,
+    client_id: int,
+    status: str,
+    total_amount: float,
+    currency: str,
+    created_at: str,
+    order_id: int | None = None,
+    id_offset: int = 0,
+    id_stride: int = 1,
+) -> int:
+    partition = ensure_order_partition(conn, int(created_at[:4]))
+    if partition.is_archived:
+        raise ValueError(f"Order partition {partition.year} is archived (read-only)")
+
+    if order_id is None and id_stride > 1:
+        # Sharded: next id above the local maximum with id % stride == offset,
+        # so shards never hand out the same order_id.
+        cur = conn.execute(
+            """
+            INSERT INTO order_ids(order_id)
+            SELECT m + 1 + (((? - (m + 1)) % ?) + ?) % ?
+            FROM (SELECT COALESCE(MAX(order_id), 0) AS m FROM order_ids)
+            """,
+            (int(id_offset), int(id_stride), int(id_stride), int(id_stride)),
+        )
+    elif order_id is None:
+        cur = conn.execute("INSERT INTO order_ids DEFAULT VALUES")
+    else:
+        cur = conn.execute("INSERT INTO order_ids(order_id) VALUES (?)", (int(order_id),))
+    order_id = int(cur.lastrowid)
+    cur.close()
+    return execute(
+        conn,
+        f"INSERT INTO {partition_table(partition.year)}({ORDER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+        (order_id, int(client_id), status, total_amount, currency, created_at),
+    )
+
+
+def _migrate_legacy_orders(conn: sqlite3.Connection) -> None:
+    # Databases created before partitioning keep every order in one `orders` table.
+    legacy = query_one(conn, "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'orders'")
+    if legacy is None:
+        return
+
+    years = [row["year"] for row in query_all(conn, "SELECT DISTINCT substr(created_at, 1, 4) AS year FROM orders")]
+    # Creating partitions commits (executescript), so do it before the copy;
+    # empty partition tables left behind by a crash are harmless.
+    for year in years:
+        ensure_order_partition(conn, int(year))
+
+    # Copy and drop in one transaction: a crash leaves `orders` as the only
+    # source of truth.
+    conn.execute("BEGIN")
+    try:
+        for year in years:
+            conn.execute(
+                f"INSERT INTO {partition_table(int(year))}({ORDER_COLUMNS}) "
+                f"SELECT {ORDER_COLUMNS} FROM orders WHERE substr(created_at, 1, 4) = ?",
+                (year,),
+            )
+        conn.execute("INSERT INTO order_ids(order_id) SELECT order_id FROM orders")
+        conn.execute("DROP TABLE orders")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+# --- Archival -------------------------------------------------------------------
+
+
+def _main_db_file(conn: sqlite3.Connection) -> Path:
+    for row in query_all(conn, "PRAGMA database_list"):
+        if row["name"] == "main":
+            return Path(row["file"] or "memory.db")
+    return Path("memory.db")
+
+
+def archive_order_partition(conn: sqlite3.Connection, year: int, archive_dir: str) -> OrderPartition:
+    """Move a hot partition into its own vacuumed, read-only database file."""
+    partition = ensure_order_partition(conn, year)
+    if partition.is_archived:
+        return partition
+
+    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+    main_file = _main_db_file(conn)
+    path = Path(archive_dir) / f"{main_file.stem}.orders_{partition.year:04d}.db"
+    fd, tmp_name = tempfile.mkstemp(dir=archive_dir, prefix=f"{path.name}.", suffix=".tmp")
+    os.close(fd)
+    tmp = Path(tmp_name)
+
+    # Hold the write lock for the whole move and re-check the catalog under it:
+    # another process (e.g. a second uvicorn worker) may have archived this
+    # year since we looked, and its file at `path` must not be touched.
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = query_one(conn, "SELECT archive_path FROM order_partitions WHERE year = ?", (partition.year,))
+        if row["archive_path"] is not None:
+            conn.rollback()
+            return OrderPartition(year=partition.year, archive_path=row["archive_path"])
+
+        # ATTACH is not allowed inside a transaction, so the archive is written
+        # by a second connection; the lock keeps the hot table stable meanwhile.
+        archive = sqlite3.connect(str(tmp), uri=True)
+        try:
+            archive.execute("ATTACH DATABASE ? AS hot", (main_file.resolve().as_uri() + "?mode=ro",))
+            # Archive files hold a plain `orders` table (no FK: clients live elsewhere).
+            _create_partition(archive, "orders", with_fk=False)
+            archive.execute(
+                f"INSERT INTO main.orders({ORDER_COLUMNS}) "
+                f"SELECT {ORDER_COLUMNS} FROM hot.{partition_table(partition.year)} ORDER BY order_id"
+            )
+            archive.commit()
+            archive.execute("DETACH DATABASE hot")
+            archive.execute("VACUUM")
+        finally:
+            archive.close()
+        os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(tmp, path)
+
+        conn.execute(
+            "UPDATE order_partitions SET archive_path = ? WHERE year = ?",
+            (str(path), partition.year),
+        )
+        conn.execute(f"DROP TABLE main.{partition_table(partition.year)}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        if tmp.exists():
+            os.chmod(tmp, stat.S_IRUSR | stat.S_IWUSR)
+            tmp.unlink()
+    return OrderPartition(year=partition.year, archive_path=str(path))
+
+
+def archive_closed_partitions(
+    conn: sqlite3.Connection,
+    archive_dir: str,
+    current_year: int,
+) -> list[int]:
+    """Archive every hot partition older than `current_year`; returns archived years."""
+    archived: list[int] = []
+    for partition in order_partitions(conn, to_year=int(current_year) - 1):
+        if not partition.is_archived:
+            archive_order_partition(conn, partition.year, archive_dir)
+            archived.append(partition.year)
+    return sorted(archived)
+
+
+# --- Sharding -----------------------------------------------------------------
+
+
+class ShardLayoutError(RuntimeError):
+    pass
+
+
+def shard_paths(db_path: str, shards: int) -> list[str]:
+    """Database files for `shards` shards; a single shard keeps `db_path` as is."""
+    shards = max(1, int(shards))
+    if shards == 1:
+        return [db_path]
+    path = Path(db_path)
+    return [str(path.with_name(f"{path.stem}.shard{i}{path.suffix}")) for i in range(shards)]
+
+
+def shard_for(client_id: int, shards: int) -> int:
+    # crc32 instead of hash(): stable across processes and Python versions.
+    return zlib.crc32(str(int(client_id)).encode("ascii")) % max(1, int(shards))
+
+
+def _stored_shard_count(db_path: str) -> int | None:
+    conn = connect(db_path, read_only=True)
+    try:
+        if query_one(conn, "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'shard_meta'") is None:
+            return None
+        row = query_one(conn, "SELECT value FROM shard_meta WHERE key = 'shard_count'")
+        return int(row["value"]) if row else None
+    finally:
+        conn.close()
+
+
+def check_shard_layout(db_path: str, shards: int) -> None:
+    """Raise ShardLayoutError unless the files on disk match a `shards`-shard layout.
+
+    Without this, changing SQLITE_SHARDS would silently create (and seed) empty
+    shard files next to the real data.
+    """
+    shards = max(1, int(shards))
+    for head in (db_path, shard_paths(db_path, 2)[0]):
+        if not Path(head).exists():
+            continue
+        stored = _stored_shard_count(head)
+        if stored is None and head == db_path:
+            stored = 1  # single database from before sharding
+        elif stored is None:
+            raise ShardLayoutError(f"{head} has no recorded shard layout; it was not created by init_shards")
+        if stored != shards or shard_paths(db_path, stored)[0] != head:
+            raise ShardLayoutError(
+                f"{head} belongs to a {stored}-shard layout but SQLITE_SHARDS={shards}; "
+                f"set SQLITE_SHARDS={stored} or run `python -m app.rebalance {shards}` with SQLITE_SHARDS={stored}"
+            )
+        missing = [p for p in shard_paths(db_path, shards) if not Path(p).exists()]
+        if missing:
+            raise ShardLayoutError(f"Missing shard files: {', '.join(missing)}")
+
+
+class ShardSet:
+    """Connections to every shard plus routing by client_id.
+
+    Clients and all of their orders live on the shard picked by `shard_for`.
+    Cross-client reads go through `scatter`, which queries shards in parallel.
+    """
+
+    def __init__(self, conns: list[sqlite3.Connection]) -> None:
+        if not conns:
+            raise ValueError("ShardSet needs at least one connection")
+        self.conns = conns
+        self._pool: ThreadPoolExecutor | None = None
+
+    def __len__(self) -> int:
+        return len(self.conns)
+
+    def index_for(self, client_id: int) -> int:
+        return shard_for(client_id, len(self.conns))
+
+    def for_client(self, client_id: int) -> sqlite3.Connection:
+        return self.conns[self.index_for(client_id)]
+
+    def scatter(self, fn: Callable[[sqlite3.Connection], T]) -> list[T]:
+        """Run `fn` on every shard (in parallel when sharded); results in shard order."""
+        if len(self.conns) == 1:
+            return [fn(self.conns[0])]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=len(self.conns), thread_name_prefix="shard")
+        return list(self._pool.map(fn, self.conns))
+
+    def allocate_client_id(self) -> int:
+        return execute(self.conns[0], "INSERT INTO client_ids DEFAULT VALUES")
+
+    def insert_client(self, name: str, email: str | None, created_at: str) -> int:
+        client_id = self.allocate_client_id()
+        execute(
+            self.for_client(client_id),
+            "INSERT INTO clients(client_id, name, email, created_at) VALUES (?, ?, ?, ?)",
+            (client_id, name, email, created_at),
+        )
+        return client_id
+
+    def insert_order(
+        self,
+        client_id: int,
+        status: str,
+        total_amount: float,
+        currency: str,
+        created_at: str,
+    ) -> int:
+        index = self.index_for(client_id)
+        return insert_order(
+            self.conns[index],
+            client_id,
+            status,
+            total_amount,
+            currency,
+            created_at,
+            id_offset=index,
+            id_stride=len(self.conns),
+        )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        for conn in self.conns:
+            conn.close()
+
+
+def connect_shards(paths: list[str], read_only: bool = False) -> ShardSet:
+    # Shard connections are used from the scatter pool, one thread per shard at a time.
+    return ShardSet([connect(path, check_same_thread=False, read_only=read_only) for path in paths])
+
+
+def init_shards(shards: ShardSet) -> None:
+    for conn in shards.conns:
+        init_db(conn)
+
+    # Keep the allocator above every existing id (pre-sharding data, rebalanced shards).
+    max_client_id = max(
+        shards.scatter(lambda conn: int(query_one(conn, "SELECT COALESCE(MAX(client_id), 0) AS m FROM clients")["m"]))
+    )
+    allocator = shards.conns[0]
+    row = query_one(allocator, "SELECT COALESCE(MAX(client_id), 0) AS m FROM client_ids")
+    if max_client_id > int(row["m"]):
+        execute(allocator, "INSERT INTO client_ids(client_id) VALUES (?)", (max_client_id,))
+
+    execute(
+        allocator,
+        "INSERT OR IGNORE INTO shard_meta(key, value) VALUES ('shard_count', ?)",
+        (str(len(shards)),),
+    )
+    stored = int(query_one(allocator, "SELECT value FROM shard_meta WHERE key = 'shard_count'")["value"])
+    if stored != len(shards):
+        raise ShardLayoutError(f"Shards were created as a {stored}-shard layout, not {len(shards)}")
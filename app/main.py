@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import sqlite3
+from datetime import datetime
 from fastapi import FastAPI
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
 from .config import get_settings
-from .db import connect, init_db
+from .db import ShardSet, archive_closed_partitions, check_shard_layout, connect_shards, init_shards, shard_paths
 from .seed import seed_if_empty
 from .schemas import ChatRequest, ChatResponse
 from . import tools as tool_mod
@@ -16,18 +16,27 @@ from .gemini import chat_with_tools, GeminiError
 app = FastAPI(title="lab8 - klienci i zamówienia")
 
 
-def _get_conn() -> sqlite3.Connection:
+def _get_shards() -> ShardSet:
     settings = get_settings()
-    conn = connect(settings.sqlite_path)
-    init_db(conn)
-    seed_if_empty(conn)
-    return conn
+    shards = connect_shards(shard_paths(settings.sqlite_path, settings.sqlite_shards))
+    init_shards(shards)
+    seed_if_empty(shards)
+    return shards
 
 
 @app.on_event("startup")
 def _startup() -> None:
-    conn = _get_conn()
-    conn.close()
+    settings = get_settings()
+    # Fail fast instead of creating empty shards next to the existing data.
+    check_shard_layout(settings.sqlite_path, settings.sqlite_shards)
+    shards = _get_shards()
+    try:
+        if settings.auto_archive_orders:
+            # Closed years are only read from now on; move them to cold storage.
+            year = datetime.utcnow().year
+            shards.scatter(lambda conn: archive_closed_partitions(conn, settings.archive_dir, year))
+    finally:
+        shards.close()
 
 
 @app.get("/")
@@ -41,28 +50,28 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest) -> ChatResponse:
     settings = get_settings()
-    conn = _get_conn()
+    shards = _get_shards()
 
     try:
         tool_impl = {
-            "search_clients": lambda query, limit=5: tool_mod.search_clients(conn, query=query, limit=limit),
-            "get_client": lambda client_id: tool_mod.get_client(conn, client_id=client_id),
+            "search_clients": lambda query, limit=5: tool_mod.search_clients(shards, query=query, limit=limit),
+            "get_client": lambda client_id: tool_mod.get_client(shards, client_id=client_id),
             "count_orders_for_client": lambda client_id, status=None, from_date=None, to_date=None: tool_mod.count_orders_for_client(
-                conn,
+                shards,
                 client_id=client_id,
                 status=status,
                 from_date=from_date,
                 to_date=to_date,
             ),
             "sum_orders_for_client": lambda client_id, status=None, from_date=None, to_date=None: tool_mod.sum_orders_for_client(
-                conn,
+                shards,
                 client_id=client_id,
                 status=status,
                 from_date=from_date,
                 to_date=to_date,
             ),
             "get_orders_for_client": lambda client_id, status=None, limit=5: tool_mod.get_orders_for_client(
-                conn,
+                shards,
                 client_id=client_id,
                 status=status,
                 limit=limit,
@@ -85,4 +94,4 @@ async def chat(req: ChatRequest) -> ChatResponse:
         return ChatResponse(answer=f"Błąd Gemini: {e}")
 
     finally:
-        conn.close()
+        shards.close()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from datetime import datetime
+import os
+from pathlib import Path
+import shutil
+import sqlite3
+import stat
+from typing import Any
+
+from .db import (
+    ORDER_COLUMNS,
+    ShardLayoutError,
+    ShardSet,
+    archive_order_partition,
+    check_shard_layout,
+    connect_shards,
+    ensure_order_partition,
+    init_shards,
+    order_partitions,
+    partition_table,
+    query_all,
+    query_one,
+    query_partition,
+    shard_paths,
+)
+
+
+def _is_empty(shards: ShardSet) -> bool:
+    return not any(
+        shards.scatter(
+            lambda conn: query_one(conn, "SELECT 1 FROM clients LIMIT 1") is not None or bool(order_partitions(conn))
+        )
+    )
+
+
+def _has_current_schema(conn: sqlite3.Connection) -> bool:
+    tables = {r["name"] for r in query_all(conn, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {"client_ids", "order_ids", "order_partitions"} <= tables and "orders" not in tables
+
+
+def rebalance(source: ShardSet, target: ShardSet, archive_dir: str) -> dict[str, int]:
+    """Copy every client and order from `source` into the empty `target`, routed by `target`.
+
+    `source` is only read, so it can be opened read-only. Order ids are kept.
+    Years archived in the source are archived again in the target shards
+    (into `archive_dir`), so hot/cold layout survives the move.
+    """
+    if not all(source.scatter(_has_current_schema)):
+        raise ValueError("Source shards use an old schema; start the app once to migrate them before rebalancing")
+    init_shards(target)
+    if not _is_empty(target):
+        raise ValueError("Target shards must be empty")
+
+    stats = {"clients": 0, "orders": 0}
+    archived_years: set[int] = set()
+
+    for conn in source.conns:
+        clients: dict[int, list[tuple[Any, ...]]] = defaultdict(list)
+        for r in query_all(conn, "SELECT client_id, name, email, created_at FROM clients ORDER BY client_id"):
+            clients[target.index_for(r["client_id"])].append(tuple(r))
+        for index, batch in clients.items():
+            target.conns[index].executemany(
+                "INSERT INTO clients(client_id, name, email, created_at) VALUES (?, ?, ?, ?)", batch
+            )
+            target.conns[index].commit()
+            stats["clients"] += len(batch)
+
+        for partition in order_partitions(conn):
+            if partition.is_archived:
+                archived_years.add(partition.year)
+            orders: dict[int, list[tuple[Any, ...]]] = defaultdict(list)
+            for r in query_partition(conn, partition, f"SELECT {ORDER_COLUMNS} FROM {{orders}} ORDER BY order_id"):
+                orders[target.index_for(r["client_id"])].append(tuple(r))
+            for index, batch in orders.items():
+                tconn = target.conns[index]
+                ensure_order_partition(tconn, partition.year)
+                tconn.executemany(
+                    f"INSERT INTO {partition_table(partition.year)}({ORDER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", batch
+                )
+                tconn.executemany("INSERT INTO order_ids(order_id) VALUES (?)", [(row[0],) for row in batch])
+                tconn.commit()
+                stats["orders"] += len(batch)
+
+    # New ids must stay above every id handed out under the old layout, not
+    # just above the ones that happened to land on the same shard.
+    high_water = max(
+        source.scatter(lambda conn: int(query_one(conn, "SELECT COALESCE(MAX(order_id), 0) AS m FROM order_ids")["m"]))
+    )
+    for tconn in target.conns:
+        tconn.execute(
+            "INSERT OR IGNORE INTO order_ids(order_id) VALUES (?)",
+            (high_water,),
+        )
+        tconn.commit()
+    init_shards(target)
+
+    for tconn in target.conns:
+        for partition in order_partitions(tconn):
+            if partition.year in archived_years:
+                archive_order_partition(tconn, partition.year, archive_dir)
+
+    return stats
+
+
+def _remove_tree(path: Path) -> None:
+    def _make_writable(func: Any, name: str, _exc: Any) -> None:
+        # Archive files are read-only, which blocks deletion on Windows.
+        os.chmod(name, stat.S_IRUSR | stat.S_IWUSR)
+        func(name)
+
+    if path.exists():
+        shutil.rmtree(path, onerror=_make_writable)
+
+
+def main(argv: list[str] | None = None) -> None:
+    from .config import get_settings
+
+    parser = argparse.ArgumentParser(
+        prog="python -m app.rebalance",
+        description="Redistribute clients and orders across a new number of SQLite shards.",
+    )
+    parser.add_argument("shards", type=int, help="Target number of shards")
+    args = parser.parse_args(argv)
+    if args.shards < 1:
+        parser.error("shards must be >= 1")
+
+    settings = get_settings()
+    sources = shard_paths(settings.sqlite_path, settings.sqlite_shards)
+    targets = shard_paths(settings.sqlite_path, args.shards)
+    # Every client hashed to a missing shard would be dropped from the new layout.
+    missing = [p for p in sources if not Path(p).exists()]
+    if missing:
+        parser.error(f"Missing shard files for SQLITE_SHARDS={settings.sqlite_shards}: {', '.join(missing)}")
+    try:
+        check_shard_layout(settings.sqlite_path, settings.sqlite_shards)
+    except ShardLayoutError as e:
+        parser.error(str(e))
+
+    # Build the new layout next to the old one and swap files only once the
+    # copy has finished, so a failed run leaves the current shards untouched.
+    stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    base = Path(settings.sqlite_path).parent
+    staging = base / f".rebalance-{stamp}"
+    backup = base / f".pre-rebalance-{stamp}"
+    staged = [str(staging / Path(p).name) for p in targets]
+    archive_dir = Path(settings.archive_dir) / f"rebalance-{stamp}"
+
+    source_set = connect_shards(sources, read_only=True)
+    target_set = connect_shards(staged)
+    try:
+        try:
+            stats = rebalance(source_set, target_set, str(archive_dir))
+        finally:
+            source_set.close()
+            target_set.close()
+    except BaseException:
+        # Nothing outside the staging/archive directories was written yet.
+        _remove_tree(staging)
+        _remove_tree(archive_dir)
+        raise
+
+    backup.mkdir(parents=True)
+    for path in sources:
+        shutil.move(path, backup / Path(path).name)
+    for src, dst in zip(staged, targets):
+        os.replace(src, dst)
+    staging.rmdir()
+
+    print(
+        f"Moved {stats['clients']} clients and {stats['orders']} orders "
+        f"from {len(sources)} to {len(targets)} shard(s); old files are in {backup}."
+    )
+    print(f"Set SQLITE_SHARDS={args.shards} in .env before starting the app.")
+
+
+if __name__ == "__main__":
+    main()
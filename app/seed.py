@@ -2,16 +2,15 @@ from __future__ import annotations
 
 from datetime import datetime
 import random
-import sqlite3
 
-from .db import query_one, execute
+from .db import ShardSet, order_partitions, query_one, query_partition
 
 
 def _now_iso() -> str:
     return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
 
-def seed_if_empty(conn: sqlite3.Connection) -> None:
+def seed_if_empty(shards: ShardSet) -> None:
     clients = [
         ("ACME Sp. z o.o.", "contact@acme.example"),
         ("Beta S.A.", "office@beta.example"),
@@ -38,16 +37,14 @@ def seed_if_empty(conn: sqlite3.Connection) -> None:
     client_ids: list[int] = []
     for name, email in clients:
         # Try to re-use existing rows to avoid duplicates when re-running.
-        row = query_one(conn, "SELECT client_id FROM clients WHERE email = ?", (email,))
-        if row is None:
-            row = query_one(conn, "SELECT client_id FROM clients WHERE name = ?", (name,))
+        matches = shards.scatter(
+            lambda conn: query_one(conn, "SELECT client_id FROM clients WHERE email = ?", (email,))
+            or query_one(conn, "SELECT client_id FROM clients WHERE name = ?", (name,))
+        )
+        row = next((m for m in matches if m is not None), None)
 
         if row is None:
-            client_id = execute(
-                conn,
-                "INSERT INTO clients(name, email, created_at) VALUES (?, ?, ?)",
-                (name, email, _now_iso()),
-            )
+            client_id = shards.insert_client(name, email, _now_iso())
         else:
             client_id = int(row["client_id"])
 
@@ -55,8 +52,24 @@ def seed_if_empty(conn: sqlite3.Connection) -> None:
 
     statuses = ["new", "paid", "shipped", "cancelled"]
     for client_id in client_ids:
-        existing_orders_row = query_one(conn, "SELECT COUNT(*) AS cnt FROM orders WHERE client_id = ?", (client_id,))
-        existing_orders = int(existing_orders_row["cnt"]) if existing_orders_row else 0
+        conn = shards.for_client(client_id)
+        # Demo orders are dated 2025; once that year is archived it is read-only.
+        if any(p.is_archived for p in order_partitions(conn, 2025, 2025)):
+            continue
+
+        # Only "at least two orders?" matters, so look at hot partitions first
+        # and touch archived files only while that is still undecided.
+        existing_orders = 0
+        for partition in sorted(order_partitions(conn), key=lambda p: p.is_archived):
+            if existing_orders >= 2:
+                break
+            rows = query_partition(
+                conn,
+                partition,
+                "SELECT COUNT(*) AS cnt FROM (SELECT 1 FROM {orders} WHERE client_id = ? LIMIT 2)",
+                (client_id,),
+            )
+            existing_orders += int(rows[0]["cnt"]) if rows else 0
         # Ensure more than one order per person.
         missing_to_two = max(0, 2 - existing_orders)
         extra = random.randint(0, 4)
@@ -65,11 +78,7 @@ def seed_if_empty(conn: sqlite3.Connection) -> None:
             status = random.choice(statuses)
             amount = round(random.uniform(50, 1200), 2)
             created_at = _random_date_2025_iso()
-            execute(
-                conn,
-                "INSERT INTO orders(client_id, status, total_amount, currency, created_at) VALUES (?, ?, ?, ?, ?)",
-                (client_id, status, amount, "PLN", created_at),
-            )
+            shards.insert_order(client_id, status, amount, "PLN", created_at)
 
 
 def _random_date_2025_iso() -> str:
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 from datetime import datetime
-import sqlite3
+import heapq
+from itertools import islice
 from typing import Any
 
-from .db import query_all, query_one
+from .db import ShardSet, order_partitions, query_all, query_one, query_partition
 
 
 def _parse_iso_date(value: str) -> str:
@@ -17,30 +18,38 @@ def _parse_iso_date(value: str) -> str:
     return value
 
 
-def search_clients(conn: sqlite3.Connection, query: str, limit: int = 5) -> dict[str, Any]:
+def search_clients(shards: ShardSet, query: str, limit: int = 5) -> dict[str, Any]:
     query = (query or "").strip()
     limit = max(1, min(int(limit or 5), 20))
     if not query:
         return {"clients": []}
 
     like = f"%{query}%"
-    rows = query_all(
-        conn,
-        """
-        SELECT client_id, name, email
-        FROM clients
-        WHERE name LIKE ? OR email LIKE ?
-        ORDER BY name ASC
-        LIMIT ?
-        """,
-        (like, like, limit),
+    per_shard = shards.scatter(
+        lambda conn: [
+            dict(r)
+            for r in query_all(
+                conn,
+                """
+                SELECT client_id, name, email
+                FROM clients
+                WHERE name LIKE ? OR email LIKE ?
+                ORDER BY name ASC, client_id ASC
+                LIMIT ?
+                """,
+                (like, like, limit),
+            )
+        ]
     )
-    return {"clients": [dict(r) for r in rows]}
+    # Each shard is already sorted (BINARY collation == Python str order), so a
+    # k-way merge of the per-shard top-`limit` gives the global top-`limit`.
+    merged = heapq.merge(*per_shard, key=lambda c: (c["name"], c["client_id"]))
+    return {"clients": list(islice(merged, limit))}
 
 
-def get_client(conn: sqlite3.Connection, client_id: int) -> dict[str, Any]:
+def get_client(shards: ShardSet, client_id: int) -> dict[str, Any]:
     row = query_one(
-        conn,
+        shards.for_client(client_id),
         "SELECT client_id, name, email, created_at FROM clients WHERE client_id = ?",
         (int(client_id),),
     )
@@ -49,18 +58,17 @@ def get_client(conn: sqlite3.Connection, client_id: int) -> dict[str, Any]:
     return {"client": dict(row)}
 
 
-def count_orders_for_client(
-    conn: sqlite3.Connection,
+def _order_filters(
     client_id: int,
-    status: str | None = None,
-    from_date: str | None = None,
-    to_date: str | None = None,
-) -> dict[str, Any]:
-    client_id = int(client_id)
-    status = (status or "").strip() or None
-
+    status: str | None,
+    from_date: str | None,
+    to_date: str | None,
+) -> tuple[list[str], list[Any], int | None, int | None]:
+    # Returns WHERE parts/params plus the year range used to prune partitions.
     where = ["client_id = ?"]
     params: list[Any] = [client_id]
+    from_year: int | None = None
+    to_year: int | None = None
 
     if status:
         where.append("status = ?")
@@ -68,6 +76,7 @@ def count_orders_for_client(
 
     if from_date:
         fd = _parse_iso_date(from_date)
+        from_year = int(fd[:4])
         if len(fd) == 4:
             where.append("created_at >= ?")
             params.append(f"{fd}-01-01T00:00:00Z")
@@ -77,6 +86,7 @@ def count_orders_for_client(
 
     if to_date:
         td = _parse_iso_date(to_date)
+        to_year = int(td[:4])
         if len(td) == 4:
             where.append("created_at < ?")
             params.append(f"{int(td)+1}-01-01T00:00:00Z")
@@ -84,86 +94,80 @@ def count_orders_for_client(
             where.append("created_at <= ?")
             params.append(td if td.endswith("Z") else td + "Z")
 
-    sql = f"SELECT COUNT(*) AS cnt FROM orders WHERE {' AND '.join(where)}"
-    row = query_one(conn, sql, params)
-    return {"client_id": client_id, "order_count": int(row["cnt"]) if row else 0}
+    return where, params, from_year, to_year
 
 
-def sum_orders_for_client(
-    conn: sqlite3.Connection,
+def count_orders_for_client(
+    shards: ShardSet,
     client_id: int,
     status: str | None = None,
     from_date: str | None = None,
     to_date: str | None = None,
 ) -> dict[str, Any]:
     client_id = int(client_id)
+    conn = shards.for_client(client_id)
     status = (status or "").strip() or None
 
-    where = ["client_id = ?"]
-    params: list[Any] = [client_id]
+    where, params, from_year, to_year = _order_filters(client_id, status, from_date, to_date)
+    sql = f"SELECT COUNT(*) AS cnt FROM {{orders}} WHERE {' AND '.join(where)}"
+    count = 0
+    for partition in order_partitions(conn, from_year, to_year):
+        rows = query_partition(conn, partition, sql, params)
+        count += int(rows[0]["cnt"]) if rows else 0
+    return {"client_id": client_id, "order_count": count}
 
-    if status:
-        where.append("status = ?")
-        params.append(status)
 
-    if from_date:
-        fd = _parse_iso_date(from_date)
-        if len(fd) == 4:
-            where.append("created_at >= ?")
-            params.append(f"{fd}-01-01T00:00:00Z")
-        else:
-            where.append("created_at >= ?")
-            params.append(fd if fd.endswith("Z") else fd + "Z")
-
-    if to_date:
-        td = _parse_iso_date(to_date)
-        if len(td) == 4:
-            where.append("created_at < ?")
-            params.append(f"{int(td)+1}-01-01T00:00:00Z")
-        else:
-            where.append("created_at <= ?")
-            params.append(td if td.endswith("Z") else td + "Z")
+def sum_orders_for_client(
+    shards: ShardSet,
+    client_id: int,
+    status: str | None = None,
+    from_date: str | None = None,
+    to_date: str | None = None,
+) -> dict[str, Any]:
+    client_id = int(client_id)
+    conn = shards.for_client(client_id)
+    status = (status or "").strip() or None
 
-    sql = f"SELECT COALESCE(SUM(total_amount), 0) AS total, currency FROM orders WHERE {' AND '.join(where)}"
-    row = query_one(conn, sql, params)
-    currency = row["currency"] if row and row["currency"] else "PLN"
-    total = float(row["total"]) if row else 0.0
-    return {"client_id": client_id, "total_amount": total, "currency": currency}
+    where, params, from_year, to_year = _order_filters(client_id, status, from_date, to_date)
+    sql = f"SELECT COALESCE(SUM(total_amount), 0) AS total, currency FROM {{orders}} WHERE {' AND '.join(where)}"
+    total = 0.0
+    currency = None
+    for partition in order_partitions(conn, from_year, to_year):
+        rows = query_partition(conn, partition, sql, params)
+        if not rows:
+            continue
+        total += float(rows[0]["total"])
+        currency = currency or rows[0]["currency"]
+    return {"client_id": client_id, "total_amount": total, "currency": currency or "PLN"}
 
 
 def get_orders_for_client(
-    conn: sqlite3.Connection,
+    shards: ShardSet,
     client_id: int,
     status: str | None = None,
     limit: int = 5,
 ) -> dict[str, Any]:
     client_id = int(client_id)
+    conn = shards.for_client(client_id)
     status = (status or "").strip() or None
     limit = max(1, min(int(limit or 5), 50))
 
-    if status:
-        rows = query_all(
-            conn,
-            """
-            SELECT order_id, client_id, status, total_amount, currency, created_at
-            FROM orders
-            WHERE client_id = ? AND status = ?
-            ORDER BY created_at DESC
-            LIMIT ?
-            """,
-            (client_id, status, limit),
-        )
-    else:
-        rows = query_all(
-            conn,
-            """
-            SELECT order_id, client_id, status, total_amount, currency, created_at
-            FROM orders
-            WHERE client_id = ?
-            ORDER BY created_at DESC
-            LIMIT ?
-            """,
-            (client_id, limit),
-        )
-
-    return {"client_id": client_id, "orders": [dict(r) for r in rows]}
+    where, params, _, _ = _order_filters(client_id, status, None, None)
+    sql = f"""
+        SELECT order_id, client_id, status, total_amount, currency, created_at
+        FROM {{orders}}
+        WHERE {' AND '.join(where)}
+        ORDER BY created_at DESC
+        LIMIT ?
+        """
+
+    # Partitions come newest first and never overlap, so we can stop as soon
+    # as the newest ones fill the limit.
+    orders: list[dict[str, Any]] = []
+    for partition in order_partitions(conn):
+        rows = query_partition(conn, partition, sql, [*params, limit - len(orders)])
+        orders.extend(dict(r) for r in rows)
+        if len(orders) >= limit:
+            break
+
+    return {"client_id": client_id, "orders": orders}